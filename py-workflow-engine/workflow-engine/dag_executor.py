@@ -1,19 +1,43 @@
 """
 DAG Executor - Orchestrates workflow execution with dependencies
 """
+import asyncio
+import json
+import logging
 import time
-from typing import Dict, Any, List, Set, Optional
+from typing import Dict, Any, Callable, List, Set, Optional
 from upstash_redis import Redis
 from step_processor import StepProcessor
 from notification_handler import NotificationHandler
 from utils import (
     build_dependency_graph,
-    topological_sort,
+    topological_levels,
+    preordered_levels,
     is_selection_dependency,
     extract_selection_id,
-    format_timestamp,
 )
 
+try:
+    import orjson
+
+    def _dumps(value: Any) -> str:
+        return orjson.dumps(value).decode()  # upstash expects str
+
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# Cap concurrent Redis calls (Upstash enforces per-plan connection limits)
+_REDIS_CONCURRENCY = 8
+
+# Log templates used once per step, built at import time rather than per loop
+_STEP_BANNER = "Step %d/%d: %s"
+_STEP_ABORTED = "⏭️  Step aborted: %s"
+_STEP_FAILED = "❌ Step failed: %s"
+
 
 class DAGExecutor:
     """Executes workflow steps as a Directed Acyclic Graph (DAG)"""
@@ -24,19 +48,48 @@ class DAGExecutor:
         webhook_url: Optional[str] = None,
         step_timeout: int = 45,
         max_retries: int = 2,
-        retry_delay: int = 3
+        retry_delay: int = 3,
+        max_parallel: int = 8
     ):
         self.redis = redis
-        self.step_processor = StepProcessor(timeout=step_timeout)
+        self.step_processor = StepProcessor(timeout=step_timeout, redis=redis)
         self.notifier = NotificationHandler(webhook_url)
         self.max_retries = max_retries
         self.retry_delay = retry_delay
-        
+
+        # Concurrency controls for parallel step execution
+        self._semaphore = asyncio.Semaphore(max_parallel)
+        self._state_lock = asyncio.Lock()
+
         # Execution state
         self.completed_steps: Set[str] = set()
         self.failed_steps: Set[str] = set()
         self.aborted_steps: Set[str] = set()
         self.step_outputs: Dict[str, Any] = {}
+
+        # Per-step dependencies partitioned into (selection_deps, data_deps)
+        self._dep_index: Dict[str, tuple[List[str], List[str]]] = {}
+
+        # Per-step dependency checks compiled into closures at planning time
+        self._checks: Dict[str, Callable] = {}
+
+        # Per-workflow cache of Redis reads (selection lists are immutable
+        # for the duration of one execution)
+        self._selection_cache: Dict[str, Any] = {}
+
+        # Outputs evicted from step_outputs after their last consumer ran
+        # (still recoverable from Redis via _lazy_fetch)
+        self._evicted: Set[str] = set()
+
+        # Output names referenced as selection dependencies (the only ones
+        # worth persisting to Redis) and names actually written there
+        self._selection_targets: Set[str] = set()
+        self._persisted: Set[str] = set()
+
+        # In-flight Redis fetches, so concurrent siblings reading the same
+        # key coalesce into a single GET (single-flight)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._redis_semaphore = asyncio.Semaphore(_REDIS_CONCURRENCY)
     
     async def execute_workflow(
         self,
@@ -45,11 +98,12 @@ class DAGExecutor:
         steps_config: List[Dict],
         original_input: Any = None,
         input_data: Dict[str, str] = None,
-        workflow_name: str = None
+        workflow_name: str = None,
+        include_all_outputs: bool = False
     ) -> Dict[str, Any]:
         """
         Execute complete workflow with DAG-based ordering
-        
+
         Args:
             workflow_id: Unique workflow execution ID
             namespace: Workspace namespace
@@ -57,20 +111,19 @@ class DAGExecutor:
             original_input: Original input data
             input_data: Input blocks referenced by workflow (input_1, input_2, etc.)
             workflow_name: Optional workflow name
-        
+            include_all_outputs: Embed every step output in the result
+                (defaults to just the output keys to avoid doubling memory)
+
         Returns:
             Dictionary with execution results
         """
-        print(f"\n{'='*60}")
-        print(f"🚀 WORKFLOW EXECUTION STARTED")
-        print(f"{'='*60}")
-        print(f"Workflow ID: {workflow_id}")
-        print(f"Namespace: {namespace}")
-        print(f"Total steps: {len(steps_config)}")
-        print(f"Timestamp: {format_timestamp()}")
-        print(f"{'='*60}\n")
-        
-        start_time = time.time()
+        logger.info(
+            "🚀 Workflow execution started: %s (namespace=%s, steps=%d)",
+            workflow_id, namespace, len(steps_config)
+        )
+
+        # Monotonic clock: wall-clock is subject to NTP jumps mid-workflow
+        start_time = time.monotonic()
         
         # Send workflow started notification
         await self.notifier.workflow_started(
@@ -86,151 +139,30 @@ class DAGExecutor:
         
         # Initialize step outputs with input blocks
         if input_data:
-            print(f"📥 Adding {len(input_data)} input blocks to available variables:")
+            logger.info("📥 Adding %d input blocks to available variables", len(input_data))
             for key, value in input_data.items():
                 self.step_outputs[key] = value
-                preview = value[:100] + "..." if len(value) > 100 else value
-                print(f"   ✓ {key}: {preview}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    # Stringify once so non-string blocks preview correctly
+                    preview = (s[:97] + "...") if len(s := str(value)) > 100 else s
+                    logger.debug("   ✓ %s: %s", key, preview)
         
         try:
-            # Build dependency graph
-            dep_graph = build_dependency_graph(steps_config)
-            
-            # Get execution order (topological sort)
-            execution_order = topological_sort(steps_config, dep_graph)
-            
-            print(f"📊 Execution order: {' → '.join(execution_order)}\n")
-            
-            # Create step lookup
-            steps_by_usid = {step["usid"]: step for step in steps_config}
-            
-            # Execute steps in order
-            for index, usid in enumerate(execution_order):
-                step_config = steps_by_usid[usid]
-                step_name = step_config.get("step_name", "unknown")
-                
-                print(f"\n{'='*60}")
-                print(f"Step {index + 1}/{len(execution_order)}: {step_name}")
-                print(f"{'='*60}")
-                
-                # Check if step should be executed (selection dependencies)
-                should_execute, abort_reason = await self._check_selection_dependencies(
-                    step_config,
-                    workflow_id
-                )
-                
-                if not should_execute:
-                    print(f"⏭️  Step aborted: {abort_reason}")
-                    self.aborted_steps.add(usid)
-                    
-                    # Notify step aborted
-                    await self.notifier.step_aborted(
-                        workflow_id=workflow_id,
-                        namespace=namespace,
-                        step_name=step_name,
-                        usid=usid,
-                        reason=abort_reason,
-                        step_index=index + 1,
-                        total_steps=len(execution_order)
-                    )
-                    
-                    continue
-                
-                # Check if dependencies are met (non-selection dependencies)
-                dependencies_met, missing_deps = self._check_data_dependencies(step_config)
-                
-                if not dependencies_met:
-                    error_msg = f"Missing dependencies: {missing_deps}"
-                    print(f"❌ {error_msg}")
-                    self.failed_steps.add(usid)
-                    
-                    # Notify step failed
-                    await self.notifier.step_failed(
-                        workflow_id=workflow_id,
-                        namespace=namespace,
-                        step_name=step_name,
-                        usid=usid,
-                        error=error_msg,
-                        step_index=index + 1,
-                        total_steps=len(execution_order)
-                    )
-                    
-                    raise Exception(error_msg)
-                
-                # Notify step started
-                await self.notifier.step_started(
-                    workflow_id=workflow_id,
-                    namespace=namespace,
-                    step_name=step_name,
-                    usid=usid,
-                    step_index=index + 1,
-                    total_steps=len(execution_order)
-                )
-                
-                # Execute step
-                try:
-                    step_start = time.time()
-                    
-                    step_result = await self.step_processor.execute_step(
-                        step_config=step_config,
-                        available_outputs=self.step_outputs,
-                        max_retries=self.max_retries,
-                        retry_delay=self.retry_delay
-                    )
-                    
-                    step_execution_time = time.time() - step_start
-                    
-                    # Store outputs
-                    for output_name, output_value in step_result.items():
-                        self.step_outputs[output_name] = output_value
-                        
-                        # Store in Redis for selection dependencies
-                        redis_key = f"{workflow_id}:output:{output_name}"
-                        await self._store_in_redis(redis_key, output_value)
-                    
-                    self.completed_steps.add(usid)
-                    
-                    # Notify step completed
-                    await self.notifier.step_completed(
-                        workflow_id=workflow_id,
-                        namespace=namespace,
-                        step_name=step_name,
-                        usid=usid,
-                        outputs=step_result,
-                        execution_time=step_execution_time,
-                        step_index=index + 1,
-                        total_steps=len(execution_order)
-                    )
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"❌ Step failed: {error_msg}")
-                    self.failed_steps.add(usid)
-                    
-                    # Notify step failed
-                    await self.notifier.step_failed(
-                        workflow_id=workflow_id,
-                        namespace=namespace,
-                        step_name=step_name,
-                        usid=usid,
-                        error=error_msg,
-                        step_index=index + 1,
-                        total_steps=len(execution_order)
-                    )
-                    
-                    raise
-            
+            if len(steps_config) == 1 and not steps_config[0].get("dependencies"):
+                # Degenerate single-step workflow (common for one-shot LLM
+                # calls): run directly, skipping planning and scheduling
+                await self._run_trivial(steps_config[0], workflow_id, namespace)
+            else:
+                await self._run_levels(steps_config, workflow_id, namespace)
+
             # Workflow completed successfully
-            total_time = time.time() - start_time
-            
-            print(f"\n{'='*60}")
-            print(f"✅ WORKFLOW COMPLETED SUCCESSFULLY")
-            print(f"{'='*60}")
-            print(f"Total execution time: {total_time:.2f}s")
-            print(f"Steps completed: {len(self.completed_steps)}")
-            print(f"Steps aborted: {len(self.aborted_steps)}")
-            print(f"{'='*60}\n")
+            total_time = time.monotonic() - start_time
             
+            logger.info(
+                "✅ Workflow completed successfully in %.2fs (completed=%d, aborted=%d)",
+                total_time, len(self.completed_steps), len(self.aborted_steps)
+            )
+
             # Determine final result
             final_result = self._get_final_result()
             
@@ -245,29 +177,34 @@ class DAGExecutor:
                 steps_aborted=len(self.aborted_steps)
             )
             
-            return {
+            result = {
                 "success": True,
                 "workflow_id": workflow_id,
                 "namespace": namespace,
                 "execution_time": total_time,
                 "steps_completed": len(self.completed_steps),
                 "steps_aborted": len(self.aborted_steps),
-                "final_result": final_result,
-                "all_outputs": self.step_outputs
+                "final_result": final_result
             }
+
+            # Only embed the full output graph when explicitly requested;
+            # otherwise just report which outputs exist
+            if include_all_outputs:
+                result["all_outputs"] = self.step_outputs
+            else:
+                result["output_keys"] = list(self.step_outputs.keys())
+
+            return result
             
         except Exception as e:
-            total_time = time.time() - start_time
+            total_time = time.monotonic() - start_time
             error_msg = str(e)
             
-            print(f"\n{'='*60}")
-            print(f"❌ WORKFLOW FAILED")
-            print(f"{'='*60}")
-            print(f"Error: {error_msg}")
-            print(f"Total execution time: {total_time:.2f}s")
-            print(f"Steps completed: {len(self.completed_steps)}")
-            print(f"{'='*60}\n")
-            
+            logger.error(
+                "❌ Workflow failed after %.2fs (completed=%d): %s",
+                total_time, len(self.completed_steps), error_msg
+            )
+
             # Notify workflow failed
             await self.notifier.workflow_failed(
                 workflow_id=workflow_id,
@@ -290,93 +227,393 @@ class DAGExecutor:
         
         finally:
             # Cleanup
+            self._selection_cache.clear()
             await self.step_processor.close()
             await self.notifier.close()
     
-    async def _check_selection_dependencies(
+    async def _run_levels(
+        self,
+        steps_config: List[Dict],
+        workflow_id: str,
+        namespace: str
+    ):
+        """Plan and execute the workflow as parallel DAG levels"""
+        # Fast path: configs generated by the UI usually arrive already
+        # in dependency order, so levels fall out of one linear pass
+        execution_levels = preordered_levels(steps_config)
+
+        if execution_levels is None:
+            # Build dependency graph and group steps into levels
+            # (steps in a level have no mutual dependencies)
+            dep_graph = build_dependency_graph(steps_config)
+            execution_levels = topological_levels(steps_config, dep_graph)
+        total_steps = sum(len(level) for level in execution_levels)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "📊 Execution levels: %s",
+                " → ".join("[" + ", ".join(level) + "]" for level in execution_levels)
+            )
+
+        # Create step lookup
+        steps_by_usid = {step["usid"]: step for step in steps_config}
+
+        # Partition each step's dependencies once (selection vs data)
+        for step in steps_config:
+            selection_deps: List[str] = []
+            data_deps: List[str] = []
+            for dep in step.get("dependencies", []):
+                (selection_deps if is_selection_dependency(dep) else data_deps).append(dep)
+            self._dep_index[step["usid"]] = (selection_deps, data_deps)
+            self._selection_targets.update(selection_deps)
+            self._checks[step["usid"]] = self._compile_step_check(
+                step["usid"], selection_deps, data_deps
+            )
+
+        # Plan memory eviction: the last level at which each output is
+        # consumed as a data dependency
+        last_use_level: Dict[str, int] = {}
+        for level_index, level in enumerate(execution_levels):
+            for usid in level:
+                for dep in self._dep_index[usid][1]:
+                    last_use_level[dep] = level_index
+
+        # Execute levels in order, steps within a level concurrently
+        step_index = 0
+        for level_index, level in enumerate(execution_levels):
+            tasks = []
+            for usid in level:
+                step_index += 1
+                tasks.append(self._run_single_step(
+                    step_config=steps_by_usid[usid],
+                    workflow_id=workflow_id,
+                    namespace=namespace,
+                    step_index=step_index,
+                    total_steps=total_steps
+                ))
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+            # Fail the workflow on the first step error in this level
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            # Evict outputs whose last consumer just ran; only outputs
+            # actually persisted to Redis are safe to drop from memory
+            for name, last_level in last_use_level.items():
+                if (
+                    last_level == level_index
+                    and name in self._persisted
+                    and name not in ("final_result", "result")
+                    and name in self.step_outputs
+                ):
+                    self.step_outputs.pop(name)
+                    self._evicted.add(name)
+
+    async def _run_trivial(
         self,
         step_config: Dict,
-        workflow_id: str
-    ) -> tuple[bool, str]:
+        workflow_id: str,
+        namespace: str
+    ):
+        """Fast path for a one-step workflow with no dependencies"""
+        self._dep_index[step_config["usid"]] = ([], [])
+        self._checks[step_config["usid"]] = self._compile_step_check(
+            step_config["usid"], [], []
+        )
+        await self._run_single_step(
+            step_config=step_config,
+            workflow_id=workflow_id,
+            namespace=namespace,
+            step_index=1,
+            total_steps=1
+        )
+
+    async def _run_single_step(
+        self,
+        step_config: Dict,
+        workflow_id: str,
+        namespace: str,
+        step_index: int,
+        total_steps: int
+    ):
         """
-        Check if step should execute based on selection dependencies
-        
-        Returns:
-            (should_execute, abort_reason)
+        Run one step: dependency checks, notifications, execution, output storage
+        Steps in the same level run concurrently, bounded by the semaphore
         """
-        dependencies = step_config.get("dependencies", [])
-        usid = step_config.get("usid")
-        
-        for dep in dependencies:
-            if is_selection_dependency(dep):
-                # Get selection list from Redis
-                redis_key = f"{workflow_id}:output:{dep}"
-                selection_list = await self._get_from_redis(redis_key)
-                
-                if selection_list is None:
-                    return False, f"Selection dependency {dep} not found"
-                
-                if not isinstance(selection_list, list):
-                    return False, f"Selection dependency {dep} is not a list"
-                
-                # Check if current step's USID is in selection list
-                if usid not in selection_list:
-                    return False, f"USID {usid} not in selection {dep}"
-        
-        return True, ""
-    
-    def _check_data_dependencies(self, step_config: Dict) -> tuple[bool, List[str]]:
+        usid = step_config["usid"]
+        step_name = step_config.get("step_name", "unknown")
+
+        logger.info(_STEP_BANNER, step_index, total_steps, step_name)
+
+        # Run the step's precompiled dependency checks
+        should_execute, abort_reason, missing_deps = await self._checks[usid](workflow_id)
+
+        if not should_execute:
+            logger.info(_STEP_ABORTED, abort_reason)
+            self.aborted_steps.add(usid)
+
+            # Notify step aborted
+            self.notifier.step_aborted(
+                workflow_id=workflow_id,
+                namespace=namespace,
+                step_name=step_name,
+                usid=usid,
+                reason=abort_reason,
+                step_index=step_index,
+                total_steps=total_steps
+            )
+
+            return
+
+        if missing_deps:
+            error_msg = f"Missing dependencies: {missing_deps}"
+            logger.error("❌ %s", error_msg)
+            self.failed_steps.add(usid)
+
+            # Notify step failed
+            self.notifier.step_failed(
+                workflow_id=workflow_id,
+                namespace=namespace,
+                step_name=step_name,
+                usid=usid,
+                error=error_msg,
+                step_index=step_index,
+                total_steps=total_steps
+            )
+
+            raise Exception(error_msg)
+
+        # Notify step started
+        self.notifier.step_started(
+            workflow_id=workflow_id,
+            namespace=namespace,
+            step_name=step_name,
+            usid=usid,
+            step_index=step_index,
+            total_steps=total_steps
+        )
+
+        # Execute step
+        try:
+            step_start = time.monotonic()
+
+            async with self._semaphore:
+                step_result = await self.step_processor.execute_step(
+                    step_config=step_config,
+                    available_outputs=self.step_outputs,
+                    max_retries=self.max_retries,
+                    retry_delay=self.retry_delay
+                )
+
+            step_execution_time = time.monotonic() - step_start
+
+            # Store outputs (guard shared state against concurrent siblings)
+            async with self._state_lock:
+                self.step_outputs.update(step_result)
+                self.completed_steps.add(usid)
+
+            # Store in Redis for selection dependencies
+            await self._store_outputs_in_redis(workflow_id, step_result)
+
+            # Notify step completed
+            self.notifier.step_completed(
+                workflow_id=workflow_id,
+                namespace=namespace,
+                step_name=step_name,
+                usid=usid,
+                outputs=step_result,
+                execution_time=step_execution_time,
+                step_index=step_index,
+                total_steps=total_steps
+            )
+
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(_STEP_FAILED, error_msg)
+            self.failed_steps.add(usid)
+
+            # Notify step failed
+            self.notifier.step_failed(
+                workflow_id=workflow_id,
+                namespace=namespace,
+                step_name=step_name,
+                usid=usid,
+                error=error_msg,
+                step_index=step_index,
+                total_steps=total_steps
+            )
+
+            raise
+
+    def _compile_step_check(
+        self,
+        usid: str,
+        selection_deps: List[str],
+        data_deps: List[str]
+    ) -> Callable:
         """
-        Check if all data dependencies are available
-        
-        Returns:
-            (dependencies_met, missing_dependencies)
+        Partial-evaluate a step's dependency checks into a closure over its
+        precomputed dependency tuples, so the per-execution check is a tight
+        loop over locals with no dict lookups or predicate calls
+
+        The closure returns (should_execute, abort_reason, missing_deps)
         """
-        dependencies = step_config.get("dependencies", [])
-        missing = []
-        
-        for dep in dependencies:
-            # Skip selection dependencies (handled separately)
-            if is_selection_dependency(dep):
-                continue
-            
-            # Check if output is available
-            if dep not in self.step_outputs:
-                missing.append(dep)
-        
-        return len(missing) == 0, missing
+        selection_deps = tuple(selection_deps)
+        data_deps = tuple(data_deps)
+        step_outputs = self.step_outputs
+        get_many = self._get_many_from_redis
+        lazy_fetch = self._lazy_fetch
+
+        async def check(workflow_id: str) -> tuple[bool, str, List[str]]:
+            if selection_deps:
+                # Fetch all selection lists for this step in one round-trip
+                redis_keys = [f"{workflow_id}:output:{dep}" for dep in selection_deps]
+                selection_lists = await get_many(redis_keys)
+
+                for dep, selection_list in zip(selection_deps, selection_lists):
+                    if selection_list is None:
+                        return False, f"Selection dependency {dep} not found", []
+
+                    if not isinstance(selection_list, list):
+                        return False, f"Selection dependency {dep} is not a list", []
+
+                    # Check if current step's USID is in selection list
+                    if usid not in selection_list:
+                        return False, f"USID {usid} not in selection {dep}", []
+
+            missing = []
+            for dep in data_deps:
+                if dep not in step_outputs and not await lazy_fetch(dep, workflow_id):
+                    missing.append(dep)
+
+            return True, "", missing
+
+        return check
+
+    async def _lazy_fetch(self, name: str, workflow_id: str) -> bool:
+        """Defensively restore an evicted output from Redis into step_outputs"""
+        if name not in self._evicted:
+            return False
+        value = await self._get_from_redis(f"{workflow_id}:output:{name}")
+        if value is None:
+            return False
+        self.step_outputs[name] = value
+        self._evicted.discard(name)
+        return True
     
     def _get_final_result(self) -> Any:
-        """Get final workflow result (last step's output or all outputs)"""
-        if not self.step_outputs:
-            return None
-        
-        # Try to find a "final_result" or "result" output
-        if "final_result" in self.step_outputs:
-            return self.step_outputs["final_result"]
-        if "result" in self.step_outputs:
-            return self.step_outputs["result"]
-        
-        # Otherwise, return all outputs
-        return self.step_outputs
+        """Get final workflow result (explicit result output or the last output)"""
+        outputs = self.step_outputs
+        # Membership, not truthiness: an empty-string/zero/False output is
+        # still the workflow's final result
+        for key in ("final_result", "result"):
+            if key in outputs:
+                return outputs[key]
+        return next(reversed(outputs.values()), None)
     
-    async def _store_in_redis(self, key: str, value: Any):
-        """Store value in Redis"""
+    async def _redis_call(self, fn, *args, **kwargs):
+        """Run a blocking upstash_redis call without stalling the event loop"""
+        async with self._redis_semaphore:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    async def _store_outputs_in_redis(self, workflow_id: str, outputs: Dict[str, Any]):
+        """Store selection-targeted step outputs in Redis with one pipelined round-trip
+
+        Outputs never referenced as a selection dependency are only needed
+        locally and skip Redis entirely.
+        """
+        to_store = {
+            name: value for name, value in outputs.items()
+            if name in self._selection_targets
+        }
+        if not to_store:
+            return
         try:
-            import json
-            self.redis.set(key, json.dumps(value), ex=3600)  # 1 hour expiry
+            pipe = self.redis.pipeline()
+            for output_name, output_value in to_store.items():
+                redis_key = f"{workflow_id}:output:{output_name}"
+                pipe.set(redis_key, _dumps(output_value), ex=3600)  # 1 hour expiry
+                # Cache selection lists so dependent steps skip the round-trip
+                self._selection_cache[redis_key] = output_value
+            await self._redis_call(pipe.exec)
+            self._persisted.update(to_store)
         except Exception as e:
-            print(f"⚠️ Failed to store in Redis: {e}")
-    
+            logger.warning("⚠️ Failed to store in Redis: %s", e)
+
+    async def _get_many_from_redis(self, keys: List[str]) -> List[Any]:
+        """Get multiple values from Redis in a single round-trip, cache-first
+
+        Keys already being fetched by a concurrent step are awaited instead
+        of re-fetched (single-flight).
+        """
+        loop = asyncio.get_running_loop()
+        results: Dict[str, Any] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        to_fetch: List[str] = []
+
+        for key in keys:
+            if key in self._selection_cache:
+                results[key] = self._selection_cache[key]
+            elif key in self._inflight:
+                waiting[key] = self._inflight[key]
+            else:
+                self._inflight[key] = loop.create_future()
+                to_fetch.append(key)
+
+        if to_fetch:
+            try:
+                try:
+                    values = await self._redis_call(self.redis.mget, *to_fetch)
+                except Exception as e:
+                    logger.warning("⚠️ Failed to get from Redis: %s", e)
+                    values = [None] * len(to_fetch)
+
+                for key, value in zip(to_fetch, values):
+                    try:
+                        parsed = _loads(value) if value else None
+                    except Exception as e:
+                        # Corrupt value: treat as missing, don't fail the batch
+                        logger.warning("⚠️ Unparseable Redis value for %s: %s", key, e)
+                        parsed = None
+                    if parsed is not None:
+                        self._selection_cache[key] = parsed
+                    results[key] = parsed
+            finally:
+                # Resolve every future we own even on error or cancellation,
+                # so single-flight waiters can never be stranded
+                for key in to_fetch:
+                    future = self._inflight.pop(key, None)
+                    if future is not None and not future.done():
+                        future.set_result(results.get(key))
+
+        for key, future in waiting.items():
+            results[key] = await future
+
+        return [results[key] for key in keys]
+
     async def _get_from_redis(self, key: str) -> Any:
-        """Get value from Redis"""
+        """Get value from Redis, consulting cache and in-flight fetches first"""
+        if key in self._selection_cache:
+            return self._selection_cache[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await inflight
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        parsed = None
         try:
-            import json
-            value = self.redis.get(key)
+            value = await self._redis_call(self.redis.get, key)
             if value:
-                return json.loads(value)
-            return None
+                parsed = _loads(value)
+                self._selection_cache[key] = parsed
         except Exception as e:
-            print(f"⚠️ Failed to get from Redis: {e}")
-            return None
+            logger.warning("⚠️ Failed to get from Redis: %s", e)
+        finally:
+            self._inflight.pop(key, None)
+            future.set_result(parsed)
+        return parsed
 
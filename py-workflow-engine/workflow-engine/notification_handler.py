@@ -1,21 +1,74 @@
 """
 Notification handler for sending workflow progress updates
 """
+import asyncio
 import httpx
 import json
-from typing import Dict, Any, Optional
+import logging
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from utils import format_timestamp, truncate_output
 
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+logger = logging.getLogger(__name__)
+
 
 class NotificationHandler:
     """Handles webhook notifications for workflow progress"""
-    
-    def __init__(self, webhook_url: Optional[str] = None):
-        self.webhook_url = webhook_url
-        self.client = httpx.AsyncClient(timeout=30.0)
-    
-    async def send_notification(
+
+    def __init__(
+        self,
+        webhook_url: Optional[str] = None,
+        batch_size: int = 16,
+        max_delay: float = 0.25
+    ):
+        # Parse the (static) webhook URL once instead of on every post
+        self.webhook_url = httpx.URL(webhook_url) if webhook_url else None
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=50,
+                max_keepalive_connections=20,
+                keepalive_expiry=60.0
+            )
+        )
+
+        # Events are queued and flushed in batches by a background task
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._flusher: Optional[asyncio.Task] = None
+
+        if self.webhook_url is None:
+            # Without a webhook every notification is a no-op; rebind the
+            # public methods once so per-event calls collapse to a constant
+            logger.debug("No webhook URL configured, notifications disabled")
+            self.dispatch = self._noop
+            self.step_started = self._noop
+            self.step_completed = self._noop
+            self.step_failed = self._noop
+            self.step_aborted = self._noop
+            self.send_notification = self._async_noop
+            self.workflow_started = self._async_noop
+            self.workflow_completed = self._async_noop
+            self.workflow_failed = self._async_noop
+
+    def _noop(self, *args, **kwargs) -> bool:
+        return False
+
+    async def _async_noop(self, *args, **kwargs) -> bool:
+        return False
+
+    def dispatch(
         self,
         event_type: str,
         workflow_id: str,
@@ -23,47 +76,100 @@ class NotificationHandler:
         data: Dict[str, Any]
     ) -> bool:
         """
-        Send notification to webhook URL
-        
+        Queue notification for batched delivery without blocking the caller
+
         Args:
             event_type: Type of event (workflow_started, step_completed, etc.)
             workflow_id: Workflow execution ID
             namespace: Workspace namespace
             data: Event-specific data
-        
+
         Returns:
-            True if notification sent successfully, False otherwise
+            True if notification queued successfully, False otherwise
         """
-        if not self.webhook_url:
-            print(f"⚠️ No webhook URL configured, skipping notification: {event_type}")
-            return False
-        
+        payload = {
+            "event": event_type,
+            "workflow_id": workflow_id,
+            "namespace": namespace,
+            "timestamp": format_timestamp(),
+            "data": data
+        }
+
+        # Start the background flusher lazily (needs a running event loop)
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+        self._queue.put_nowait(payload)
+        return True
+
+    async def send_notification(
+        self,
+        event_type: str,
+        workflow_id: str,
+        namespace: str,
+        data: Dict[str, Any],
+        flush: bool = False
+    ) -> bool:
+        """
+        Queue notification, optionally waiting until all queued events are
+        delivered (used for terminal workflow events)
+        """
+        queued = self.dispatch(event_type, workflow_id, namespace, data)
+        if queued and flush:
+            await self._queue.join()
+        return queued
+
+    async def _flush_loop(self):
+        """Drain the event queue in batches of batch_size or every max_delay seconds"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+
+            # Collect more events until the batch is full or the window closes
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._post_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _post_batch(self, events: List[Dict[str, Any]]) -> bool:
+        """Send a batch of events to the webhook URL in one request"""
         try:
-            payload = {
-                "event": event_type,
-                "workflow_id": workflow_id,
-                "namespace": namespace,
-                "timestamp": format_timestamp(),
-                "data": data
-            }
-            
-            print(f"📤 Sending notification: {event_type}")
-            
+            logger.debug("📤 Sending %d notification(s)", len(events))
+
+            # Apply deferred output truncation off the execution critical path
+            for event in events:
+                data = event["data"]
+                if data.pop("_truncate_outputs", False):
+                    data["outputs"] = {
+                        k: truncate_output(v) for k, v in data["outputs"].items()
+                    }
+
             response = await self.client.post(
                 self.webhook_url,
-                json=payload,
+                content=_dumps({"events": events}),
                 headers={"Content-Type": "application/json"}
             )
-            
+
             if response.status_code >= 200 and response.status_code < 300:
-                print(f"✅ Notification sent: {event_type}")
+                logger.info("✅ Notification batch sent (%d events)", len(events))
                 return True
             else:
-                print(f"⚠️ Webhook returned {response.status_code}: {response.text[:200]}")
+                logger.warning("⚠️ Webhook returned %d: %s", response.status_code, response.text[:200])
                 return False
-                
+
         except Exception as e:
-            print(f"❌ Failed to send notification: {e}")
+            logger.error("❌ Failed to send notifications: %s", e)
             return False
     
     async def workflow_started(
@@ -85,7 +191,7 @@ class NotificationHandler:
             }
         )
     
-    async def step_started(
+    def step_started(
         self,
         workflow_id: str,
         namespace: str,
@@ -95,7 +201,7 @@ class NotificationHandler:
         total_steps: int
     ):
         """Notify that a step has started"""
-        await self.send_notification(
+        self.dispatch(
             event_type="step_started",
             workflow_id=workflow_id,
             namespace=namespace,
@@ -108,7 +214,7 @@ class NotificationHandler:
             }
         )
     
-    async def step_completed(
+    def step_completed(
         self,
         workflow_id: str,
         namespace: str,
@@ -120,7 +226,7 @@ class NotificationHandler:
         total_steps: int
     ):
         """Notify that a step has completed successfully"""
-        await self.send_notification(
+        self.dispatch(
             event_type="step_completed",
             workflow_id=workflow_id,
             namespace=namespace,
@@ -131,11 +237,14 @@ class NotificationHandler:
                 "total_steps": total_steps,
                 "status": "completed",
                 "execution_time_seconds": execution_time,
-                "outputs": {k: truncate_output(v) for k, v in outputs.items()}
+                # Truncation is deferred to the background flusher so the
+                # step's critical path doesn't pay for the copies
+                "outputs": outputs,
+                "_truncate_outputs": True
             }
         )
     
-    async def step_failed(
+    def step_failed(
         self,
         workflow_id: str,
         namespace: str,
@@ -146,7 +255,7 @@ class NotificationHandler:
         total_steps: int
     ):
         """Notify that a step has failed"""
-        await self.send_notification(
+        self.dispatch(
             event_type="step_failed",
             workflow_id=workflow_id,
             namespace=namespace,
@@ -160,7 +269,7 @@ class NotificationHandler:
             }
         )
     
-    async def step_aborted(
+    def step_aborted(
         self,
         workflow_id: str,
         namespace: str,
@@ -171,7 +280,7 @@ class NotificationHandler:
         total_steps: int
     ):
         """Notify that a step was aborted (e.g., selection dependency not met)"""
-        await self.send_notification(
+        self.dispatch(
             event_type="step_aborted",
             workflow_id=workflow_id,
             namespace=namespace,
@@ -207,7 +316,8 @@ class NotificationHandler:
                 "steps_failed": steps_failed,
                 "steps_aborted": steps_aborted,
                 "final_result": truncate_output(final_result, max_length=1000)
-            }
+            },
+            flush=True
         )
     
     async def workflow_failed(
@@ -228,10 +338,19 @@ class NotificationHandler:
                 "error": error,
                 "execution_time_seconds": execution_time,
                 "steps_completed": steps_completed
-            }
+            },
+            flush=True
         )
-    
+
     async def close(self):
-        """Close HTTP client"""
+        """Flush remaining events and close HTTP client"""
+        if self._flusher is not None:
+            await self._queue.join()
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
         await self.client.aclose()
 
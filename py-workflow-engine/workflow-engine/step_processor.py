@@ -1,19 +1,141 @@
 """
 Step processor for executing individual workflow steps
 """
+import asyncio
+import hashlib
 import httpx
 import json
+import logging
 import time
 from typing import Dict, Any, Optional
-from utils import substitute_variables, extract_error_message
+from utils import compile_mapping, substitute_variables, extract_error_message
+
+try:
+    import orjson
+
+    def _loads(data: Any) -> Any:
+        return orjson.loads(data)
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    def _canonical_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS, default=str)
+except ImportError:
+    def _loads(data: Any) -> Any:
+        return json.loads(data)
+
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj)
+
+    def _canonical_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+logger = logging.getLogger(__name__)
+
+_SUPPORTED_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE"})
+
+# Compiled substitution functions per step: {usid: (mapping hash, fn or None)}
+# Mappings are fixed across invocations of a step, so each compiles once;
+# None records a mapping the code generator couldn't handle
+_MAPPING_FNS: Dict[str, tuple] = {}
+
+
+def _get_compiled_mapping(usid: str, mapping: Any):
+    """Return the compiled substitution function for a step's mapping"""
+    fingerprint = hashlib.sha256(_canonical_dumps(mapping)).digest()
+    cached = _MAPPING_FNS.get(usid)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    try:
+        fn = compile_mapping(mapping)
+    except Exception as e:
+        logger.debug("Mapping for %s not compilable, using interpreter: %s", usid, e)
+        fn = None
+
+    _MAPPING_FNS[usid] = (fingerprint, fn)
+    return fn
+
+
+def _extract_claude(response_data: Dict, outputs_config) -> Optional[Dict[str, Any]]:
+    """
+    Claude returns: {"content": [{"type": "text", "text": "actual content"}], ...}
+    We extract just the text so subsequent steps can use {{step_N_result}} directly
+    """
+    content_list = response_data["content"]
+    if isinstance(content_list, list) and content_list:
+        first_content = content_list[0]
+        if isinstance(first_content, dict) and "text" in first_content:
+            extracted_text = first_content["text"]
+            logger.debug("✨ Extracted Claude text: %.100s...", extracted_text)
+            return {output_name: extracted_text for output_name in outputs_config}
+    return None
+
+
+def _extract_openai(response_data: Dict, outputs_config) -> Optional[Dict[str, Any]]:
+    """OpenAI returns: {"choices": [{"message": {"content": "..."}}]}"""
+    choices = response_data["choices"]
+    if isinstance(choices, list) and choices and "message" in choices[0]:
+        content = choices[0]["message"].get("content", "")
+        logger.debug("✨ Extracted OpenAI text: %.100s...", content)
+
+        # Content that is itself JSON gets the generic output mapping
+        try:
+            return _extract_generic(_loads(content), outputs_config)
+        except json.JSONDecodeError:
+            # Store as plain text for easy access
+            return {output_name: content for output_name in outputs_config}
+    return None
+
+
+def _extract_generic(response_data: Any, outputs_config) -> Dict[str, Any]:
+    """For other APIs, map named outputs or store the full response"""
+    if not isinstance(response_data, dict):
+        return {output_name: response_data for output_name in outputs_config}
+    return {
+        output_name: response_data.get(output_name, response_data)
+        for output_name in outputs_config
+    }
+
+
+# Ordered (marker key, extractor) pairs tried against dict responses
+_EXTRACTORS = (
+    ("content", _extract_claude),
+    ("choices", _extract_openai),
+)
+
+# Shared HTTP client, created lazily and reused across processor instances
+# On warm Modal containers this keeps TCP+TLS connections to LLM endpoints
+# alive between invocations instead of paying the handshake on every step
+_GLOBAL_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _GLOBAL_CLIENT
+    if _GLOBAL_CLIENT is None:
+        _GLOBAL_CLIENT = httpx.AsyncClient(
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=50,
+                keepalive_expiry=60.0
+            )
+        )
+    return _GLOBAL_CLIENT
 
 
 class StepProcessor:
     """Processes individual workflow steps by making HTTP API calls"""
-    
-    def __init__(self, timeout: int = 30):
+
+    # Cap on buffered body size for streaming-flagged steps
+    _MAX_STREAM_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, timeout: int = 30, redis=None):
         self.timeout = timeout
-        self.client = httpx.AsyncClient(timeout=timeout, follow_redirects=True)
+        self.redis = redis
+        self.client = _get_client()
     
     async def execute_step(
         self,
@@ -37,14 +159,16 @@ class StepProcessor:
         Raises:
             Exception: If step execution fails after all retries
         """
-        step_name = step_config.get("step_name", "unknown")
-        usid = step_config.get("usid", "unknown")
-        
-        print(f"\n🚀 Executing step: {step_name} (USID: {usid})")
-        
+        # Required fields are guaranteed by payload validation, so subscript
+        # access is safe (and cheaper than .get chains with dead defaults)
+        step_name = step_config["step_name"]
+        usid = step_config["usid"]
+
+        logger.debug("🚀 Executing step: %s (USID: %s)", step_name, usid)
+
         # Prepare request
-        url = step_config.get("service_url")
-        method = step_config.get("method", "POST").upper()
+        url = step_config["service_url"]
+        method = step_config["method"].upper()
         headers = step_config.get("headers", {})
         
         # Prepare input data with variable substitution
@@ -52,148 +176,167 @@ class StepProcessor:
         input_type = input_prep.get("type", "json")
         mapping = input_prep.get("mapping", {})
         
-        # Substitute variables in mapping
-        substituted_data = substitute_variables(mapping, available_outputs)
-        
-        print(f"📝 Request URL: {url}")
-        print(f"📝 Method: {method}")
-        print(f"📝 Input type: {input_type}")
+        # Substitute variables in mapping: a per-step compiled function
+        # handles fixed mappings, falling back to the interpretive walk
+        mapping_fn = _get_compiled_mapping(usid, mapping)
+        if mapping_fn is not None:
+            substituted_data = mapping_fn(available_outputs)
+        else:
+            substituted_data = substitute_variables(mapping, available_outputs)
         
+        logger.debug("📝 Request URL: %s | method: %s | input type: %s", url, method, input_type)
+
+        # Streaming reads (opt-in via step_config["streaming"]): fetch the
+        # body incrementally with a bounded buffer instead of one large read
+        streaming = step_config.get("streaming", False)
+
+        # Result caching (opt-in via step_config["cacheable"]): deterministic
+        # steps can skip the HTTP round-trip on repeat executions. Cache
+        # access is best-effort: Redis errors degrade to a miss, never a
+        # step failure. Concurrency needs no extra cap here because the
+        # executor already bounds concurrent execute_step calls with its
+        # max_parallel semaphore
+        cacheable = self.redis is not None and step_config.get("cacheable", False)
+        cache_key = None
+        if cacheable:
+            cache_key = self._cache_key(url, method, headers, substituted_data)
+            try:
+                cached = await asyncio.to_thread(self.redis.get, cache_key)
+                if cached is not None:
+                    logger.info("⚡ Cache hit for step %s, skipping HTTP call", step_name)
+                    return _loads(cached)
+            except Exception as e:
+                logger.warning("⚠️ Cache read failed for step %s: %s", step_name, e)
+
         # Execute with retries
         last_error = None
         for attempt in range(max_retries + 1):
             try:
                 if attempt > 0:
-                    print(f"🔄 Retry attempt {attempt}/{max_retries}")
-                    await self._delay(retry_delay)
+                    logger.info("🔄 Retry attempt %d/%d", attempt, max_retries)
+                    await asyncio.sleep(retry_delay)
                 
-                start_time = time.time()
-                
-                # Make HTTP request
-                if method == "GET":
-                    response = await self.client.get(url, headers=headers, params=substituted_data)
-                elif method == "POST":
-                    response = await self.client.post(url, headers=headers, json=substituted_data)
-                elif method == "PUT":
-                    response = await self.client.put(url, headers=headers, json=substituted_data)
-                elif method == "PATCH":
-                    response = await self.client.patch(url, headers=headers, json=substituted_data)
-                elif method == "DELETE":
-                    response = await self.client.delete(url, headers=headers, json=substituted_data)
-                else:
+                start_time = time.perf_counter()
+
+                # Make HTTP request (GET sends query params, the rest a JSON body)
+                if method not in _SUPPORTED_METHODS:
                     raise ValueError(f"Unsupported HTTP method: {method}")
-                
-                execution_time = time.time() - start_time
-                
+                request_kwargs = {"headers": headers, "timeout": self.timeout}
+                request_kwargs["params" if method == "GET" else "json"] = substituted_data
+                if streaming:
+                    status_code, raw = await self._request_stream(method, url, request_kwargs)
+                else:
+                    response = await getattr(self.client, method.lower())(url, **request_kwargs)
+                    status_code, raw = response.status_code, response.content
+
+                execution_time = time.perf_counter() - start_time
+
                 # Check response status
-                if response.status_code >= 200 and response.status_code < 300:
-                    print(f"✅ Step completed successfully in {execution_time:.2f}s")
-                    
+                if status_code >= 200 and status_code < 300:
+                    logger.info("✅ Step completed successfully in %.2fs", execution_time)
+
                     # Parse response
-                    result = self._parse_response(response, step_config)
+                    result = self._parse_body(raw, step_config)
+
+                    # Cache successful results only (4xx/5xx never get here);
+                    # a failed write must not discard the successful response
+                    if cacheable:
+                        try:
+                            await asyncio.to_thread(
+                                self.redis.set,
+                                cache_key,
+                                _dumps(result),
+                                ex=step_config.get("cache_ttl", 3600)
+                            )
+                        except Exception as e:
+                            logger.warning("⚠️ Cache write failed for step %s: %s", step_name, e)
+
                     return result
                 else:
-                    error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
-                    print(f"❌ Step failed: {error_msg}")
+                    # Decode only the preview slice instead of the whole body
+                    preview = raw[:200].decode('utf-8', 'replace')
+                    error_msg = f"HTTP {status_code}: {preview}"
+                    logger.info("❌ Step failed: %s", error_msg)
                     last_error = Exception(error_msg)
-                    
+
                     # Don't retry on 4xx errors (client errors)
-                    if 400 <= response.status_code < 500:
+                    if 400 <= status_code < 500:
                         raise last_error
                     
             except httpx.TimeoutException as e:
                 last_error = e
-                print(f"⏱️ Request timeout: {e}")
+                logger.warning("⏱️ Request timeout: %s", e)
             except httpx.RequestError as e:
                 last_error = e
-                print(f"🔌 Request error: {e}")
+                logger.warning("🔌 Request error: %s", e)
             except Exception as e:
                 last_error = e
-                print(f"❌ Unexpected error: {e}")
+                logger.error("❌ Unexpected error: %s", e)
                 raise  # Don't retry on unexpected errors
         
         # All retries exhausted
         error_msg = extract_error_message(last_error)
         raise Exception(f"Step {step_name} failed after {max_retries + 1} attempts: {error_msg}")
     
-    def _parse_response(self, response: httpx.Response, step_config: Dict) -> Dict[str, Any]:
-        """Parse response and extract outputs"""
-        outputs_config = step_config.get("outputs", [])
-        
+    @staticmethod
+    def _cache_key(url: str, method: str, headers: Dict, data: Any) -> str:
+        """Build a deterministic cache key from the full call signature"""
+        canonical = _canonical_dumps({"u": url, "m": method, "h": headers, "b": data})
+        return "wfcache:" + hashlib.sha256(canonical).hexdigest()
+
+    async def _request_stream(self, method: str, url: str, request_kwargs: Dict) -> tuple:
+        """
+        Fetch a response incrementally and return (status_code, body bytes)
+        Bodies are read chunk by chunk into a bounded buffer, so oversize
+        responses fail fast instead of exhausting container memory
+        """
+        buf = bytearray()
+        async with self.client.stream(method, url, **request_kwargs) as response:
+            if response.status_code < 200 or response.status_code >= 300:
+                # Error bodies are only needed for the log preview
+                await response.aread()
+                return response.status_code, response.content
+
+            async for chunk in response.aiter_bytes():
+                buf += chunk
+                if len(buf) > self._MAX_STREAM_BYTES:
+                    raise ValueError(
+                        f"Streamed response exceeded {self._MAX_STREAM_BYTES} bytes"
+                    )
+
+        return response.status_code, bytes(buf)
+
+    def _parse_body(self, raw: bytes, step_config: Dict) -> Dict[str, Any]:
+        """Parse a response body and extract outputs"""
+        outputs_config = step_config["outputs"]
+
+        # Obvious non-JSON bodies: skip the parse attempt entirely
+        if not raw.lstrip().startswith((b'{', b'[')):
+            text = raw.decode('utf-8', 'replace')
+            return {output_name: text for output_name in outputs_config}
+
         try:
-            # Try to parse as JSON
-            response_data = response.json()
-            
-            # ============================================
-            # ANTHROPIC/CLAUDE API RESPONSE EXTRACTION
-            # ============================================
-            # Claude returns: {"content": [{"type": "text", "text": "actual content"}], ...}
-            # We extract just the text so subsequent steps can use {{step_N_result}} directly
-            if "content" in response_data and isinstance(response_data.get("content"), list):
-                content_list = response_data["content"]
-                if len(content_list) > 0:
-                    first_content = content_list[0]
-                    if isinstance(first_content, dict) and "text" in first_content:
-                        extracted_text = first_content["text"]
-                        
-                        print(f"✨ Extracted Claude text: {extracted_text[:100]}...")
-                        
-                        # Store the extracted text directly for easy variable substitution
-                        result = {}
-                        for output_name in outputs_config:
-                            result[output_name] = extracted_text
-                        return result
-            
-            # ============================================
-            # OPENAI API RESPONSE EXTRACTION
-            # ============================================
-            # OpenAI returns: {"choices": [{"message": {"content": "..."}}]}
-            if "choices" in response_data and isinstance(response_data["choices"], list):
-                if len(response_data["choices"]) > 0:
-                    choice = response_data["choices"][0]
-                    if "message" in choice:
-                        content = choice["message"].get("content", "")
-                        
-                        print(f"✨ Extracted OpenAI text: {content[:100]}...")
-                        
-                        # Try to parse content as JSON
-                        try:
-                            response_data = json.loads(content)
-                        except json.JSONDecodeError:
-                            # Store as plain text for easy access
-                            result = {}
-                            for output_name in outputs_config:
-                                result[output_name] = content
+            # Parse as JSON (orjson reads the raw bytes directly)
+            response_data = _loads(raw)
+
+            # Known LLM response shapes get their text extracted so later
+            # steps can reference {{step_N_result}} directly; non-dict
+            # responses (bare arrays) skip straight to generic handling
+            if isinstance(response_data, dict):
+                for key, extractor in _EXTRACTORS:
+                    if key in response_data:
+                        result = extractor(response_data, outputs_config)
+                        if result is not None:
                             return result
-            
-            # ============================================
-            # GENERIC JSON RESPONSE EXTRACTION
-            # ============================================
-            # For other APIs, store the full response
-            result = {}
-            for output_name in outputs_config:
-                if output_name in response_data:
-                    result[output_name] = response_data[output_name]
-                else:
-                    # If output not found, store entire response
-                    result[output_name] = response_data
-            
-            return result
-            
+
+            return _extract_generic(response_data, outputs_config)
+
         except json.JSONDecodeError:
             # Response is not JSON, return as text
-            text = response.text
-            result = {}
-            for output_name in outputs_config:
-                result[output_name] = text
-            return result
-    
-    async def _delay(self, seconds: int):
-        """Async delay"""
-        import asyncio
-        await asyncio.sleep(seconds)
+            text = raw.decode('utf-8', 'replace')
+            return {output_name: text for output_name in outputs_config}
     
     async def close(self):
-        """Close HTTP client"""
-        await self.client.aclose()
+        """No-op: the shared HTTP client stays open for connection reuse"""
+        pass
 
@@ -1,23 +1,55 @@
 """
 Utility functions for workflow engine
 """
+import ast
 import hashlib
+import heapq
 import json
+import re
+import logging
+import secrets
 import time
-from typing import Any, Dict, List
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
+try:
+    import orjson
+
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj)
+
+logger = logging.getLogger(__name__)
+
+# Compiled once: matches {{variable}} / {{variable.path[0].to.field}}
+_VAR_PATTERN = re.compile(r'\{\{([^}]+)\}\}')
+
+# Types treated as primitives by the smart-substitution fallbacks
+_PRIMITIVE_TYPES = (str, int, float, bool)
+
+# Step validation constants
+_REQUIRED_FIELDS = frozenset({"step_name", "usid", "service_url", "method", "outputs"})
+_VALID_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE"})
+
 
 def generate_workflow_id(namespace: str, workflow_name: str) -> str:
     """Generate a unique workflow execution ID"""
-    timestamp = str(time.time())
+    # BLAKE2b is cheaper than SHA-256 for this non-security use, and the
+    # nanosecond timestamp avoids collisions under concurrent bursts
+    timestamp = time.time_ns()
     data = f"{namespace}:{workflow_name}:{timestamp}"
-    return hashlib.sha256(data.encode()).hexdigest()[:16]
+    return hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
 
 
 def generate_usid() -> str:
     """Generate an 8-character hex USID"""
-    return hashlib.sha256(str(time.time()).encode()).hexdigest()[:8]
+    # Random bytes from the CSPRNG: no hashing, and unlike hashing
+    # time.time() it cannot collide when called in the same tick
+    return secrets.token_hex(4)
 
 
 def is_selection_dependency(dep: str) -> bool:
@@ -37,34 +69,28 @@ def build_dependency_graph(steps: List[Dict]) -> Dict[str, List[str]]:
     Build dependency graph from steps
     Returns: {usid: [dependent_usids]}
     """
-    graph = {}
-    output_to_step = {}
-    
     # Map outputs to steps
-    for step in steps:
-        usid = step.get("usid")
-        outputs = step.get("outputs", [])
-        for output in outputs:
-            output_to_step[output] = usid
-    
-    # Build dependency graph
+    output_to_step = {
+        out: step.get("usid")
+        for step in steps
+        for out in step.get("outputs", ())
+    }
+
+    # Build dependency graph; defaultdict drops the membership check per edge
+    graph = defaultdict(list)
     for step in steps:
         usid = step.get("usid")
         dependencies = step.get("dependencies", [])
-        
+
         for dep in dependencies:
-            # Skip selection dependencies (handled separately)
-            if is_selection_dependency(dep):
-                continue
-                
-            # Find step that produces this output
+            # Find step that produces this output. Selection dependencies
+            # count too: a gated step must be ordered after the step that
+            # produces its selection list, or its Redis check would race
+            # the producer's write
             if dep in output_to_step:
-                dep_usid = output_to_step[dep]
-                if dep_usid not in graph:
-                    graph[dep_usid] = []
-                graph[dep_usid].append(usid)
-    
-    return graph
+                graph[output_to_step[dep]].append(usid)
+
+    return dict(graph)
 
 
 def topological_sort(steps: List[Dict], dep_graph: Dict[str, List[str]]) -> List[str]:
@@ -79,22 +105,22 @@ def topological_sort(steps: List[Dict], dep_graph: Dict[str, List[str]]) -> List
         for dependent in dep_graph[usid]:
             in_degree[dependent] += 1
     
-    # Queue for steps with no dependencies
+    # Min-heap of ready steps keeps deterministic order at O(log k) per
+    # operation instead of re-sorting the queue every iteration
     queue = [usid for usid, degree in in_degree.items() if degree == 0]
+    heapq.heapify(queue)
     result = []
-    
+
     while queue:
-        # Sort queue for deterministic execution order
-        queue.sort()
-        usid = queue.pop(0)
+        usid = heapq.heappop(queue)
         result.append(usid)
-        
+
         # Reduce in-degree for dependents
         if usid in dep_graph:
             for dependent in dep_graph[usid]:
                 in_degree[dependent] -= 1
                 if in_degree[dependent] == 0:
-                    queue.append(dependent)
+                    heapq.heappush(queue, dependent)
     
     # Check for cycles
     if len(result) != len(steps):
@@ -103,110 +129,309 @@ def topological_sort(steps: List[Dict], dep_graph: Dict[str, List[str]]) -> List
     return result
 
 
+def topological_levels(steps: List[Dict], dep_graph: Dict[str, List[str]]) -> List[List[str]]:
+    """
+    Group steps into execution levels using Kahn's algorithm
+    Steps within a level have no dependencies on each other and can run concurrently
+    Returns list of levels, each a sorted list of USIDs
+    """
+    # Count incoming edges
+    in_degree = {step["usid"]: 0 for step in steps}
+
+    for usid in dep_graph:
+        for dependent in dep_graph[usid]:
+            in_degree[dependent] += 1
+
+    # Start with steps that have no dependencies
+    current = sorted(usid for usid, degree in in_degree.items() if degree == 0)
+    levels = []
+    visited = 0
+
+    while current:
+        levels.append(current)
+        visited += len(current)
+
+        next_level = []
+        for usid in current:
+            for dependent in dep_graph.get(usid, []):
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    next_level.append(dependent)
+
+        # Sort each level for deterministic execution order
+        current = sorted(next_level)
+
+    # Check for cycles
+    if visited != len(steps):
+        raise ValueError("Cycle detected in workflow dependencies")
+
+    return levels
+
+
+def preordered_levels(steps: List[Dict]) -> Optional[List[List[str]]]:
+    """
+    Fast path for steps_config already listed in dependency order
+    Verifies in one linear pass that every dependency is produced by an
+    earlier step and assigns execution levels directly, skipping the
+    graph build; returns None if steps are not preordered so the caller
+    can fall back to the full topological sort
+    """
+    produced = {out for step in steps for out in step.get("outputs", [])}
+    output_level: Dict[str, int] = {}
+    levels: List[List[str]] = []
+
+    for step in steps:
+        step_level = 0
+        for dep in step.get("dependencies", []):
+            # External inputs don't constrain ordering; selection deps do
+            # whenever their list is produced by a step in this workflow
+            if dep not in produced:
+                continue
+            dep_level = output_level.get(dep)
+            if dep_level is None:
+                # Dependency produced by a later step: not preordered
+                return None
+            step_level = max(step_level, dep_level + 1)
+
+        if step_level == len(levels):
+            levels.append([])
+        levels[step_level].append(step["usid"])
+
+        for out in step.get("outputs", []):
+            output_level[out] = step_level
+
+    return levels
+
+
+@lru_cache(maxsize=4096)
+def _parse_path(expr: str) -> Tuple[Tuple[str, ...], int]:
+    """
+    Parse a placeholder expression into path parts, handling dots and brackets
+    Converts "step_1_result.content[0].text" to ("step_1_result", "content", "0", "text")
+    Returns (parts, digit_mask) where bit i of digit_mask is set if parts[i]
+    is a numeric index; cached since templates are re-evaluated across steps
+    """
+    path = expr.replace('[', '.').replace(']', '')
+    parts = tuple(p for p in path.split('.') if p)  # Split and filter empty strings
+
+    digit_mask = 0
+    for i, part in enumerate(parts):
+        if part.isdigit():
+            digit_mask |= 1 << i
+
+    return parts, digit_mask
+
+
+def _resolve_path(expr: str, variables: Dict[str, Any]) -> Any:
+    """
+    Resolve a placeholder expression like "step_1_result.content[0].text"
+    against the variables mapping
+    Returns None when the path cannot be resolved
+    """
+    parts, digit_mask = _parse_path(expr)
+
+    value = variables
+    # Hoisted once per placeholder: the smart-substitution branches below
+    # only ever fall back to the base variable when it's a primitive
+    base_val = variables.get(parts[0]) if parts else None
+    base_is_primitive = isinstance(base_val, _PRIMITIVE_TYPES)
+
+    # Navigate through nested structure
+    try:
+        for i, part in enumerate(parts):
+            if value is None:
+                break
+
+            # Numeric part: array indexing (precomputed in _parse_path)
+            if digit_mask >> i & 1:
+                index = int(part)
+                if isinstance(value, (list, tuple)):
+                    value = value[index] if index < len(value) else None
+                else:
+                    # Trying to index a non-list/tuple (e.g., a string)
+                    # Check if this is the base variable and it's a primitive
+                    if i == 1 and base_is_primitive:
+                        # The base variable is already a primitive, return it
+                        value = base_val
+                        logger.debug("🔄 Smart substitution: %s → returning base variable (primitive type)", expr)
+                        break
+                    else:
+                        value = None
+            # Dictionary key access
+            elif isinstance(value, dict):
+                value = value.get(part)
+            # If we're trying to access a property on a primitive type
+            elif i > 0 and isinstance(value, _PRIMITIVE_TYPES):
+                # The value is already a primitive from a previous step
+                if base_is_primitive:
+                    # Return the base primitive value instead
+                    value = base_val
+                    logger.debug("🔄 Smart substitution: %s → returning base variable (primitive type)", expr)
+                    break
+                else:
+                    value = None
+            # Try attribute access as fallback
+            else:
+                try:
+                    value = getattr(value, part, None)
+                except (AttributeError, TypeError):
+                    value = None
+
+            if value is None:
+                break
+
+        return value
+
+    except (KeyError, TypeError, AttributeError, IndexError) as e:
+        # Variable not found or path invalid
+        logger.warning("⚠️ Variable substitution failed for %s: %s", expr, e)
+        return None
+
+
 def substitute_variables(template: Any, variables: Dict[str, Any]) -> Any:
     """
     Recursively substitute {{variable}} and {{variable.path[0].to.field}} patterns in template
     Supports nested field access using dot notation and array indexing with brackets
-    
+
     Examples:
         {{step_1_result}} - Direct variable access
         {{step_1_result.field}} - Nested field access
         {{step_1_result.array[0]}} - Array indexing
         {{step_1_result.content[0].text}} - Complex nested access
-    
+
     Smart handling: If step_1_result is already a string and you reference
     {{step_1_result.content[0].text}}, it will return the string itself.
     """
     if isinstance(template, str):
-        import re
-        
-        # Find all {{...}} patterns
-        pattern = r'\{\{([^}]+)\}\}'
-        matches = re.findall(pattern, template)
-        
-        for match in matches:
-            placeholder = f"{{{{{match}}}}}"
-            
-            # Parse the path, handling both dots and brackets
-            # Convert "step_1_result.content[0].text" to ["step_1_result", "content", "0", "text"]
-            path = match.replace('[', '.').replace(']', '')
-            parts = [p for p in path.split('.') if p]  # Split and filter empty strings
-            
-            value = variables
-            base_var_name = parts[0] if parts else None
-            
-            # Navigate through nested structure
-            try:
-                for i, part in enumerate(parts):
-                    if value is None:
-                        break
-                    
-                    # Try to convert to integer for array indexing
-                    if part.isdigit():
-                        index = int(part)
-                        if isinstance(value, (list, tuple)):
-                            value = value[index] if index < len(value) else None
-                        else:
-                            # Trying to index a non-list/tuple (e.g., a string)
-                            # Check if this is the base variable and it's a primitive
-                            if i == 1 and base_var_name and isinstance(variables.get(base_var_name), (str, int, float, bool)):
-                                # The base variable is already a primitive, return it
-                                value = variables.get(base_var_name)
-                                print(f"🔄 Smart substitution: {match} → returning base variable (primitive type)")
-                                break
-                            else:
-                                value = None
-                    # Dictionary key access
-                    elif isinstance(value, dict):
-                        value = value.get(part)
-                    # If we're trying to access a property on a primitive type
-                    elif i > 0 and isinstance(value, (str, int, float, bool)):
-                        # The value is already a primitive from a previous step
-                        # Check if the base variable is a primitive
-                        if base_var_name and isinstance(variables.get(base_var_name), (str, int, float, bool)):
-                            # Return the base primitive value instead
-                            value = variables.get(base_var_name)
-                            print(f"🔄 Smart substitution: {match} → returning base variable (primitive type)")
-                            break
-                        else:
-                            value = None
-                    # Try attribute access as fallback
-                    else:
-                        try:
-                            value = getattr(value, part, None)
-                        except (AttributeError, TypeError):
-                            value = None
-                    
-                    if value is None:
-                        break
-                
-                # If value found, replace placeholder
-                if value is not None:
-                    # If entire string is placeholder, return value directly (preserves type)
-                    if template == placeholder:
-                        return value
-                    # Otherwise, replace with string representation
-                    if isinstance(value, (dict, list)):
-                        template = template.replace(placeholder, json.dumps(value))
-                    else:
-                        template = template.replace(placeholder, str(value))
-                        
-            except (KeyError, TypeError, AttributeError, IndexError) as e:
-                # Variable not found or path invalid, leave placeholder as is
-                print(f"⚠️ Variable substitution failed for {match}: {e}")
-                pass
-        
-        return template
-    
-    elif isinstance(template, dict):
-        return {k: substitute_variables(v, variables) for k, v in template.items()}
-    
+        return _substitute_string(template, variables)
+
+    if isinstance(template, dict):
+        root: Any = {}
     elif isinstance(template, list):
-        return [substitute_variables(item, variables) for item in template]
-    
+        root = [None] * len(template)
     else:
         return template
 
+    # Iterative walk with an explicit stack: no per-node call frames and
+    # no RecursionError on deeply nested mappings. Substituted values go
+    # into fresh containers so the input template is never mutated
+    stack = [(template, root)]
+    while stack:
+        src, dst = stack.pop()
+        items = src.items() if isinstance(src, dict) else enumerate(src)
+        for key, value in items:
+            if isinstance(value, str):
+                # Placeholder-free strings pass through untouched
+                dst[key] = value if '{{' not in value else _substitute_string(value, variables)
+            elif isinstance(value, dict):
+                child = {}
+                dst[key] = child
+                stack.append((value, child))
+            elif isinstance(value, list):
+                child = [None] * len(value)
+                dst[key] = child
+                stack.append((value, child))
+            else:
+                dst[key] = value
+
+    return root
+
+
+def _full_value(expr: str, template: str, variables: Dict[str, Any]) -> Any:
+    """Whole-string placeholder: raw value, or the template when unresolved"""
+    value = _resolve_path(expr, variables)
+    return value if value is not None else template
+
+
+def _fmt_value(value: Any, placeholder: str) -> str:
+    """Render a resolved placeholder value for in-string substitution"""
+    if value is None:
+        # Unresolved path: leave placeholder as is
+        return placeholder
+    if isinstance(value, (dict, list)):
+        return _json_dumps(value)
+    return str(value)
+
+
+def _codegen_node(node: Any) -> str:
+    """Emit a Python expression that substitutes one template node"""
+    if isinstance(node, str):
+        if '{{' not in node:
+            return repr(node)
+
+        full = _VAR_PATTERN.fullmatch(node)
+        if full:
+            return f"_full({full.group(1)!r}, {node!r}, v)"
+
+        # _VAR_PATTERN.split alternates literal, expression, literal, ...
+        parts = []
+        for i, token in enumerate(_VAR_PATTERN.split(node)):
+            if i % 2:
+                placeholder = '{{' + token + '}}'
+                parts.append(f"_fmt(_rp({token!r}, v), {placeholder!r})")
+            elif token:
+                parts.append(repr(token))
+        return '(' + ' + '.join(parts) + ')' if parts else "''"
+
+    if isinstance(node, dict):
+        items = ', '.join(f"{k!r}: {_codegen_node(val)}" for k, val in node.items())
+        return '{' + items + '}'
+
+    if isinstance(node, list):
+        return '[' + ', '.join(_codegen_node(item) for item in node) + ']'
+
+    # Bake other constants in via repr, but only when repr round-trips to
+    # an equal value: non-finite floats repr as bare nan/inf, which would
+    # compile and then NameError at call time instead of engaging the
+    # interpreter fallback
+    try:
+        if ast.literal_eval(repr(node)) == node:
+            return repr(node)
+    except (ValueError, SyntaxError):
+        pass
+    raise ValueError(f"Mapping constant {node!r} is not compilable")
+
+
+def compile_mapping(mapping: Any) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Specialize a fixed input mapping into a generated substitution function
+    The mapping structure and placeholder paths are baked into compiled
+    code once, so each invocation only resolves values and builds the
+    result — no regex scans or template walks
+    Raises on shapes the generator cannot express; callers should fall
+    back to substitute_variables
+    """
+    source = "def _compiled(v):\n    return " + _codegen_node(mapping)
+    namespace = {"_rp": _resolve_path, "_full": _full_value, "_fmt": _fmt_value}
+    exec(compile(source, "<compiled_mapping>", "exec"), namespace)
+    return namespace["_compiled"]
+
+
+def _substitute_string(template: str, variables: Dict[str, Any]) -> Any:
+    """Substitute placeholders in a single string template"""
+    # Fast path: no placeholder marker, nothing to substitute
+    if '{{' not in template:
+        return template
+
+    # If the entire string is one placeholder, return the raw value
+    # directly (preserves non-string types)
+    full = _VAR_PATTERN.fullmatch(template)
+    if full:
+        value = _resolve_path(full.group(1), variables)
+        return value if value is not None else template
+
+    # Otherwise substitute every placeholder in a single linear pass
+    def _replace(m) -> str:
+        value = _resolve_path(m.group(1), variables)
+        if value is None:
+            # Unresolved path: leave placeholder as is
+            return m.group(0)
+        if isinstance(value, (dict, list)):
+            return _json_dumps(value)
+        return str(value)
+
+    return _VAR_PATTERN.sub(_replace, template)
+
 
 def format_timestamp(dt: datetime = None) -> str:
     """Format timestamp for logging"""
@@ -217,7 +442,7 @@ def format_timestamp(dt: datetime = None) -> str:
 
 def truncate_output(data: Any, max_length: int = 500) -> str:
     """Truncate output for logging"""
-    text = json.dumps(data) if not isinstance(data, str) else data
+    text = _json_dumps(data) if not isinstance(data, str) else data
     if len(text) > max_length:
         return text[:max_length] + "..."
     return text
@@ -231,65 +456,69 @@ def extract_error_message(error: Exception) -> str:
     return error_str
 
 
-def validate_step_config(step: Dict) -> List[str]:
-    """
-    Validate step configuration
-    Returns list of validation errors (empty if valid)
-    """
-    errors = []
-    
-    required_fields = ["step_name", "usid", "service_url", "method", "outputs"]
-    for field in required_fields:
-        if field not in step:
-            errors.append(f"Missing required field: {field}")
-    
+def _iter_step_errors(step: Dict):
+    """Yield validation errors for a step configuration, lazily"""
+    # Single C-level set difference instead of a per-field membership loop
+    for field in sorted(_REQUIRED_FIELDS - step.keys()):
+        yield f"Missing required field: {field}"
+
     # Validate USID format (8 hex chars)
     usid = step.get("usid", "")
     if len(usid) != 8:
-        errors.append(f"USID must be 8 characters, got: {usid}")
-    
+        yield f"USID must be 8 characters, got: {usid}"
+
     # Validate method
     method = step.get("method", "").upper()
-    if method not in ["GET", "POST", "PUT", "PATCH", "DELETE"]:
-        errors.append(f"Invalid HTTP method: {method}")
-    
+    if method not in _VALID_METHODS:
+        yield f"Invalid HTTP method: {method}"
+
     # Validate outputs (must be non-empty array)
     outputs = step.get("outputs", [])
     if not isinstance(outputs, list) or len(outputs) == 0:
-        errors.append("Outputs must be a non-empty array")
-    
-    return errors
+        yield "Outputs must be a non-empty array"
 
 
-def validate_pipeline_payload(payload: Dict) -> List[str]:
+def validate_step_config(step: Dict) -> List[str]:
     """
-    Validate complete pipeline payload
+    Validate step configuration
     Returns list of validation errors (empty if valid)
     """
-    errors = []
-    
+    return list(_iter_step_errors(step))
+
+
+def iter_payload_errors(payload: Dict):
+    """
+    Yield pipeline payload validation errors lazily
+    Callers that only need to know whether the payload is valid can stop
+    at the first error without materializing the full report
+    """
     # Check STEPS_CONFIG
     if "STEPS_CONFIG" not in payload:
-        errors.append("Missing STEPS_CONFIG")
-        return errors
-    
+        yield "Missing STEPS_CONFIG"
+        return
+
     steps = payload["STEPS_CONFIG"]
     if not isinstance(steps, list) or len(steps) == 0:
-        errors.append("STEPS_CONFIG must be a non-empty array")
-        return errors
-    
+        yield "STEPS_CONFIG must be a non-empty array"
+        return
+
     # Validate each step
     usids_seen = set()
     for i, step in enumerate(steps):
-        step_errors = validate_step_config(step)
-        for error in step_errors:
-            errors.append(f"Step {i} ({step.get('step_name', 'unknown')}): {error}")
-        
+        for error in _iter_step_errors(step):
+            yield f"Step {i} ({step.get('step_name', 'unknown')}): {error}"
+
         # Check for duplicate USIDs
         usid = step.get("usid")
         if usid in usids_seen:
-            errors.append(f"Duplicate USID: {usid}")
+            yield f"Duplicate USID: {usid}"
         usids_seen.add(usid)
-    
-    return errors
+
+
+def validate_pipeline_payload(payload: Dict) -> List[str]:
+    """
+    Validate complete pipeline payload
+    Returns list of validation errors (empty if valid)
+    """
+    return list(iter_payload_errors(payload))
 
@@ -6,9 +6,17 @@ Deployed on Modal with Upstash Redis for state storage
 """
 import modal
 import json
+import logging
 import os
 from typing import Dict, Any
 
+# Log level is configurable via env so step-level debug detail can be
+# turned on without redeploying
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(levelname)s %(name)s: %(message)s"
+)
+
 # Modal app configuration
 app = modal.App("objspace-workflow-engine")
 
@@ -17,7 +25,8 @@ image = (
     modal.Image.debian_slim(python_version="3.11")
     .pip_install(
         "fastapi[standard]>=0.115.0",
-        "httpx>=0.28.1",
+        "httpx[http2]>=0.28.1",
+        "orjson>=3.10.0",
         "pydantic>=2.10.6",
         "upstash-redis>=1.5.0",
         "python-dotenv>=1.0.1",
@@ -30,22 +39,43 @@ image = (
 )
 
 
+# Shared Redis client, created lazily on first use so warm Modal
+# containers reuse it across invocations (the health endpoint has no
+# Redis secret attached, so creation can't happen at import time)
+_REDIS = None
+
+
+def _get_redis():
+    global _REDIS
+    if _REDIS is None:
+        from upstash_redis import Redis
+
+        redis_url = os.environ.get("UPSTASH_REST_URL")
+        redis_token = os.environ.get("UPSTASH_REST_TOKEN")
+        if not redis_url or not redis_token:
+            raise RuntimeError("Redis credentials not configured")
+        _REDIS = Redis(url=redis_url, token=redis_token)
+    return _REDIS
+
+
 async def execute_workflow_internal(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Internal function to execute workflow
     Called by web endpoint
     """
-    from upstash_redis import Redis
     from dag_executor import DAGExecutor
-    from utils import validate_pipeline_payload
-    
+    from utils import iter_payload_errors
+
     print("\n" + "="*60)
     print("📥 WORKFLOW EXECUTION REQUEST RECEIVED")
     print("="*60)
-    
-    # Validate payload
-    validation_errors = validate_pipeline_payload(payload)
-    if validation_errors:
+
+    # Validate payload; the full error report is only materialized when
+    # the first error proves the payload invalid
+    errors = iter_payload_errors(payload)
+    first_error = next(errors, None)
+    if first_error is not None:
+        validation_errors = [first_error, *errors]
         error_msg = "Payload validation failed:\n" + "\n".join(validation_errors)
         print(f"❌ {error_msg}")
         return {
@@ -68,18 +98,15 @@ async def execute_workflow_internal(payload: Dict[str, Any]) -> Dict[str, Any]:
     print(f"Steps: {len(steps_config)}")
     print("="*60 + "\n")
     
-    # Initialize Redis client
-    redis_url = os.environ.get("UPSTASH_REST_URL")
-    redis_token = os.environ.get("UPSTASH_REST_TOKEN")
-    
-    if not redis_url or not redis_token:
+    # Shared Redis client (created once per container)
+    try:
+        redis = _get_redis()
+    except RuntimeError as e:
         return {
             "success": False,
-            "error": "Redis credentials not configured"
+            "error": str(e)
         }
     
-    redis = Redis(url=redis_url, token=redis_token)
-    
     # Extract settings
     error_handling = pipeline_settings.get("error_handling", {})
     timeouts = pipeline_settings.get("timeouts", {})
@@ -89,14 +116,16 @@ async def execute_workflow_internal(payload: Dict[str, Any]) -> Dict[str, Any]:
     retry_delay = error_handling.get("retry_delay", 3)
     step_timeout = timeouts.get("step_timeout", 45)
     webhook_url = notifications.get("webhook_url")
-    
+    max_concurrent_steps = pipeline_settings.get("max_concurrent_steps", 8)
+
     # Create DAG executor
     executor = DAGExecutor(
         redis=redis,
         webhook_url=webhook_url,
         step_timeout=step_timeout,
         max_retries=max_retries,
-        retry_delay=retry_delay
+        retry_delay=retry_delay,
+        max_parallel=max_concurrent_steps
     )
     
     # Execute workflow
@@ -106,7 +135,8 @@ async def execute_workflow_internal(payload: Dict[str, Any]) -> Dict[str, Any]:
         steps_config=steps_config,
         original_input=original_input,
         input_data=input_data,
-        workflow_name=workflow_name
+        workflow_name=workflow_name,
+        include_all_outputs=payload.get("include_all_outputs", False)
     )
     
     return result